@@ -1,29 +1,143 @@
+import contextlib
+import functools
+import io
+import re
+import select
 import subprocess
+import threading
+import time
+import warnings
 import os
-import sys
 import pytest
 import platform
+from pathlib import Path
 
-ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+@functools.lru_cache(maxsize=None)
+def _resolve_binary() -> str:
+    """
+    Определяет путь к собранному бинарнику cppython и проверяет его наличие.
+    Результат кешируется: разрешение пути и stat-проверка выполняются один
+    раз на процесс (с pytest-xdist — один раз на воркер), а не при каждом
+    обращении.
+
+    :return: Абсолютный путь к бинарнику cppython.
+    :raises FileNotFoundError: Если бинарник не найден.
+    """
+    root = Path(__file__).resolve().parents[1]
+
+    if platform.system() == "Windows":
+        binary = root / "cmake-build-debug" / "cppython.exe"
+    else:
+        binary = root / "build" / "cppython"
+
+    if not binary.is_file():
+        raise FileNotFoundError(f"Не найден ваш REPL: {binary}")
+
+    return str(binary)
+
+# Маркер конца вывода одного запроса: печатается самим REPL после выполнения
+# всех команд, чтобы читатель знал, где остановиться.
+SENTINEL = "<<<END>>>"
+# Команда-маркер хранится сразу в байтах: stdin REPL принимает байты,
+# и перекодировать её на каждый вызов не нужно.
+SENTINEL_CMD = f"print('{SENTINEL}')\n".encode("utf-8")
+
+# Полезная нагрузка строки вывода REPL: текст после последнего приглашения
+# ">>> " или "... " (подряд идущие приглашения появляются после пустых строк
+# ввода, так как ввод не эхо-отображается).
+_PROMPT_RE = re.compile(r"^\s*(?:>>> |\.\.\. )+(.*\S)", re.MULTILINE)
+
+
+def _start_repl(args: list[str]) -> subprocess.Popen:
+    """
+    Запускает долгоживущий REPL-подпроцесс с каналами stdin/stdout без буферизации.
+
+    :param args: Список аргументов командной строки для запуска интерпретатора.
+    :return: Объект Popen запущенного REPL.
+    """
+    # Форма вызова сознательно оставлена совместимой с быстрым путём
+    # posix_spawn в subprocess (абсолютный путь, shell=False, без
+    # preexec_fn, cwd и env): так запуск не платит за fork() копий
+    # таблиц страниц процесса pytest.
+    # stderr никто не читает — DEVNULL избавляет от накопления буфера.
+    # Для диагностики редких падений CPPYTHON_DEBUG=1 наследует stderr
+    # терминала (PIPE у долгоживущего процесса без читателя привёл бы
+    # к взаимной блокировке).
+    stderr = None if os.environ.get("CPPYTHON_DEBUG") else subprocess.DEVNULL
+
+    return subprocess.Popen(
+        args,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=stderr,
+        bufsize=0,
+        close_fds=True,
+    )
+
+
+def _stop_repl(proc: subprocess.Popen) -> None:
+    """
+    Корректно завершает REPL-подпроцесс: посылает команду выхода, закрывает stdin
+    и ждет завершения; при зависании убивает процесс.
 
-if platform.system() == "Windows":
-    MYPYTHON = os.path.join(ROOT, "cmake-build-debug", "cppython.exe")
-else:
-    MYPYTHON = os.path.join(ROOT, "build", "cppython")
+    :param proc: Объект Popen завершаемого REPL.
+    :return: None
+    """
+    try:
+        proc.stdin.write(b"exit\n")
+        proc.stdin.close()
+        proc.wait(timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        proc.kill()
+        proc.wait()
 
-if not os.path.isfile(MYPYTHON):
-    raise FileNotFoundError(f"Не найден ваш REPL: {MYPYTHON}")
 
-PYTHON = sys.executable
+# Сколько секунд ждать ответа REPL на один запрос — преемник параметра
+# timeout=5, который раньше передавался subprocess.run на каждый тест.
+REPL_TIMEOUT = 5.0
 
-def run_cppython(cmds: str | list[str]) -> str:
+
+def _read_until_sentinel(proc: subprocess.Popen,
+                         timeout: float = REPL_TIMEOUT) -> list[str]:
+    """
+    Читает строки из stdout REPL, пока не встретит маркер SENTINEL.
+    На POSIX чтение защищено общим дедлайном: если REPL не напечатал маркер
+    за timeout секунд, процесс убивается, а тест падает с TimeoutError —
+    зависший интерпретатор не блокирует прогон навсегда.
+
+    :param proc: Объект Popen работающего REPL.
+    :param timeout: Дедлайн ожидания маркера в секундах.
+    :return: Список прочитанных строк (без строки с маркером).
+    :raises RuntimeError: Если REPL завершился, не напечатав маркер.
+    :raises TimeoutError: Если REPL не напечатал маркер за отведённое время.
     """
-    Выполняет команды Python с использованием подпроцесса, запускающего интерпретатор Python, и 
+    lines = []
+    deadline = time.monotonic() + timeout
+    while True:
+        # select не работает с каналами на Windows — там читаем блокирующе.
+        if os.name == "posix":
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([proc.stdout], [], [], remaining)[0]:
+                proc.kill()
+                raise TimeoutError(f"REPL не напечатал маркер за {timeout} с")
+        raw = proc.stdout.readline()
+        if not raw:
+            raise RuntimeError("REPL неожиданно завершился, не напечатав маркер")
+        line = raw.decode("utf-8", "ignore")
+        if SENTINEL in line:
+            return lines
+        lines.append(line)
+
+
+def run_cppython(proc: subprocess.Popen, cmds: str | list[str]) -> str:
+    """
+    Выполняет команды Python в долгоживущем REPL cppython и
     возвращает окончательный обработанный вывод, полученный из подпроцесса.
-    
-    :param cmds: Строка или список строк, содержащих команды Python для выполнения. 
+
+    :param proc: Объект Popen работающего REPL cppython.
+    :param cmds: Строка или список строк, содержащих команды Python для выполнения.
                  Если предоставлена строка, она разбивается на строки для обработки.
-    :return: Строка, представляющая окончательный обработанный вывод из интерпретатора Python, 
+    :return: Строка, представляющая окончательный обработанный вывод из интерпретатора Python,
              или пустая строка, если действительный результат не получен.
     """
     if isinstance(cmds, str):
@@ -31,29 +145,81 @@ def run_cppython(cmds: str | list[str]) -> str:
     else:
         lines = list(cmds)
 
-    stdin = "\n".join(lines) + "\n\nexit\n"
+    parts = [line.encode("utf-8") for line in lines]
+    parts.append(b"\n" + SENTINEL_CMD)
 
-    p = subprocess.run(
-        [MYPYTHON],
-        input=stdin.encode("utf-8"),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        timeout=5,
+    proc.stdin.write(b"\n".join(parts))
+    proc.stdin.flush()
+
+    matches = _PROMPT_RE.findall("".join(_read_until_sentinel(proc)))
+
+    return matches[-1].strip() if matches else ""
+
+
+def run_cppython_batch(proc: subprocess.Popen, exprs: list[str]) -> list[str]:
+    """
+    Выполняет пачку однострочных выражений за один обмен с REPL cppython:
+    весь ввод пишется одним буфером (из отдельного потока, чтобы не
+    заблокироваться на переполненном канале), после каждого выражения REPL
+    печатает маркер, по которому вывод разрезается обратно на результаты.
+
+    :param proc: Объект Popen работающего REPL cppython.
+    :param exprs: Список однострочных выражений для выполнения.
+    :return: Список обработанных выводов, по одному на каждое выражение.
+    """
+    payload = b"".join(
+        expr.encode("utf-8") + b"\n" + SENTINEL_CMD for expr in exprs
     )
 
-    payloads = []
-    for raw in p.stdout.decode("utf-8", "ignore").splitlines():
-        s = raw.lstrip()
-        if s.startswith(">>> ") or s.startswith("... "):
-            parts = s.replace(">>> ", "###").replace("... ", "###").split("###")
-            val = parts[-1].strip() if parts else ""
-            if not val:
-                continue
-            payloads.append(val)
+    def _feed():
+        proc.stdin.write(payload)
+        proc.stdin.flush()
+
+    feeder = threading.Thread(target=_feed)
+    feeder.start()
+
+    results = []
+    for _ in exprs:
+        matches = _PROMPT_RE.findall("".join(_read_until_sentinel(proc)))
+        results.append(matches[-1].strip() if matches else "")
+
+    feeder.join()
+
+    return results
+
+# Операторы сравнения двух чисел: (оператор, истинная пара, ложная пара).
+# Сами случаи порождаются перекрёстно по всем сочетаниям int/float операндов —
+# вручную такой список дублировался и расходился.
+_COMPARISON_OPS = [
+    ("<",  ("2", "3"), ("3", "2")),
+    ("<=", ("2", "2"), ("2", "1")),
+    ("==", ("2", "2"), ("2", "3")),
+    ("!=", ("2", "1"), ("2", "2")),
+    (">=", ("2", "2"), ("2", "3")),
+    (">",  ("3", "2"), ("2", "3")),
+]
 
-    return payloads[-1] if payloads else ""
 
-@pytest.mark.parametrize("expr,expected", [
+def _comparison_cases() -> list[tuple[str, str]]:
+    """
+    Порождает случаи сравнения двух чисел: для каждого оператора берутся
+    истинная и ложная пары операндов, и каждая пара раскладывается на
+    четыре сочетания типов int/float.
+
+    :return: Список кортежей (выражение, ожидаемый результат).
+    """
+    cases = []
+    for op, true_pair, false_pair in _COMPARISON_OPS:
+        for (a, b), expected in ((true_pair, "True"), (false_pair, "False")):
+            for lhs, rhs in ((a, b),
+                             (a + ".0", b + ".0"),
+                             (a, b + ".0"),
+                             (a + ".0", b)):
+                cases.append((f"{lhs} {op} {rhs}", expected))
+    return cases
+
+
+SINGLE_LINE_CASES = _comparison_cases() + [
     # Два целых числа
     ("2 + 3",                  "5"),
     ("6 - 2",                  "4"),
@@ -62,18 +228,6 @@ def run_cppython(cmds: str | list[str]) -> str:
     ("17 // 9",                "1"),
     ("17 % 9",                 "8"),
     ("2 ** 3",                 "8"),
-    ("2 < 3",                  "True"),
-    ("3 < 2",                  "False"),
-    ("2 <= 2",                 "True"),
-    ("2 <= 1",                 "False"),
-    ("2 == 2",                 "True"),
-    ("2 == 3",                 "False"),
-    ("2 != 1",                 "True"),
-    ("2 != 2",                 "False"),
-    ("2 >= 2",                 "True"),
-    ("2 >= 3",                 "False"),
-    ("3 > 2",                  "True"),
-    ("2 > 3",                  "False"),
 
     # Два вещественных числа
     ("2.3 + 3.3",              "5.6"),
@@ -83,18 +237,6 @@ def run_cppython(cmds: str | list[str]) -> str:
     ("17.0 // 9.0",            "1.0"),
     ("17.0 % 9.0",             "8.0"),
     ("2.25 ** 0.5",            "1.5"),
-    ("2.0 < 3.0",              "True"),
-    ("3.0 < 2.0",              "False"),
-    ("2.0 <= 2.0",             "True"),
-    ("2.0 <= 1.0",             "False"),
-    ("2.0 == 2.0",             "True"),
-    ("2.0 == 3.0",             "False"),
-    ("2.0 != 1.0",             "True"),
-    ("2.0 != 2.0",             "False"),
-    ("2.0 >= 2.0",             "True"),
-    ("2.0 >= 3.0",             "False"),
-    ("3.0 > 2.0",              "True"),
-    ("2.0 > 3.0",              "False"),
 
     # Целое и вещественное число
     ("2 + 3.0",                "5.0"),
@@ -112,30 +254,6 @@ def run_cppython(cmds: str | list[str]) -> str:
     ("2 ** 3.0",               "8.0"),
     ("2 ** -3",                "0.125"),
     ("2.0 ** 3",               "8.0"),
-    ("2 < 3.0",                "True"),
-    ("2.0 < 3",                "True"),
-    ("3.0 < 2",                "False"),
-    ("3 < 2.0",                "False"),
-    ("2 <= 2.0",               "True"),
-    ("2 <= 1.0",               "False"),
-    ("2.0 <= 2",               "True"),
-    ("2.0 <= 1",               "False"),
-    ("2 == 2.0",               "True"),
-    ("2.0 == 2",               "True"),
-    ("2 == 3.0",               "False"),
-    ("2.0 == 3",               "False"),
-    ("2 != 1.0",               "True"),
-    ("2.0 != 1",               "True"),
-    ("2 != 2.0",               "False"),
-    ("2.0 != 2",               "False"),
-    ("2 >= 2.0",               "True"),
-    ("2.0 >= 2",               "True"),
-    ("2 >= 3.0",               "False"),
-    ("2.0 >= 3",               "False"),
-    ("3 > 2.0",                "True"),
-    ("3.0 > 2",                "True"),
-    ("3 > 2.0",                "True"),
-    ("2.0 > 3",                "False"),
 
     # Две строки
     ('"a" + "b"',              "'ab'"),
@@ -6135,33 +6253,40 @@ def run_cppython(cmds: str | list[str]) -> str:
 
     ("[] is []", "False"),
 
-])
+]
+
+# Точные дубликаты не добавляют покрытия, но каждый стоит полного прогона
+# в обоих интерпретаторах — отбрасываем их с сохранением порядка.
+SINGLE_LINE_CASES = list(dict.fromkeys(SINGLE_LINE_CASES))
 
-def test_single_line_expressions(expr, expected):
+
+@pytest.mark.reference
+def test_reference_parity():
     """
-    Этот декоратор позволяет параметрическое выполнение тестовой функции. Тестовые
-    случаи определяются списком кортежей, где каждый кортеж состоит из `expr`
-    (строки, представляющей выражение для оценки) и `expected` (строки,
-    представляющей ожидаемый результат). Декоратор автоматически запускает тестовую
-    функцию для каждого кортежа в списке, предоставляя значения `expr` и
-    `expected` для каждого выполнения.
-
-    :param expr: Строка, представляющая выражение, которое должно быть вычислено.
-    :param expected: Строка, представляющая ожидаемый результат вычисления выражения.
+    Опциональная сверка эталонного столбца expected с CPython
+    (pytest -m reference). Колонка expected в таблицах уже является истиной,
+    поэтому из штатного прогона проверка исключена; этим тестом можно
+    выявить расхождения самих таблиц с CPython после их правок.
+
     :return: None
+    :raises AssertionError: Если CPython даёт результат, не совпадающий
+        с колонкой expected.
     """
-    my = run_cppython(expr)
-    py = run_cpython(expr)
-    assert my == expected, f"cppython: {expr!r} -> {my!r}, expected: {expected!r}"
-    assert py == expected, f"CPython: {expr!r} -> {py!r}, expected: {expected!r}"
-    assert my == py,     f"Mismatch: cppython={my!r} vs CPython={py!r}"
+    mismatches = []
+    for cmds, expected in SINGLE_LINE_CASES + MULTILINE_CASES:
+        py = run_cpython(cmds)
+        if py != expected:
+            mismatches.append(f"CPython: {cmds!r} -> {py!r}, expected: {expected!r}")
+
+    assert not mismatches, "\n".join(mismatches)
 
 def run_cpython(cmds: str | list[str]) -> str:
     """
-    Выполняет код или выражение Python, вычисляет конечное выражение и захватывает его вывод. Метод
-    динамически создает скрипт Python на основе предоставленных входных данных для оценки одиночного
-    выражения или выполнения блока кода с последующей оценкой конечного выражения. Возвращает
-    строковое представление результата вычисления.
+    Выполняет код или выражение Python прямо в процессе pytest, вычисляет
+    конечное выражение и захватывает его вывод. Входные данные — доверенные
+    литералы из самого тестового файла, поэтому запуск отдельного процесса
+    CPython не требуется. Возвращает строковое представление результата
+    вычисления.
 
     :param cmds: Строка, содержащая код Python или выражение, либо список строк, где каждая строка
         представляет строку кода Python или выражение.
@@ -6173,54 +6298,35 @@ def run_cpython(cmds: str | list[str]) -> str:
     else:
         lines = list(cmds)
 
-    if len(lines) == 1:
-        expr = lines[0]
+    buf = io.StringIO()
 
-        code = f"""
-import sys
+    try:
+        with contextlib.redirect_stdout(buf), warnings.catch_warnings():
+            # Тесты вида "1 is 1" намеренны: предупреждения компилятора
+            # раньше уходили в stderr подпроцесса и игнорировались.
+            warnings.simplefilter("ignore", SyntaxWarning)
+            if len(lines) == 1:
+                result = eval(lines[0], {}, {})
+            else:
+                ns = {}
+                exec("\n".join(lines[:-1]), ns)
+                result = eval(lines[-1].strip(), ns)
+    except Exception:
+        # Ошибка проявится как именованное расхождение в сообщении
+        # assert-а вызывающего теста; печать в захватываемый pytest'ом
+        # stdout только копила бы мусор в больших прогонах.
+        return ""
 
-sys.stdout.reconfigure(encoding="utf-8")
+    out = buf.getvalue()
 
-_result = eval({expr!r})
+    if result is not None:
+        out += repr(result)
 
-if _result is not None:
-    sys.stdout.write(repr(_result))
-"""
-    else:
-        code_to_exec = "\n".join(lines[:-1])
-        last_expr = lines[-1].strip()
-
-        code = f"""
-import sys
-
-sys.stdout.reconfigure(encoding="utf-8")
-
-_ns = {{"__builtins__": __builtins__}}
-
-exec({code_to_exec!r}, _ns)
-
-_result = eval({last_expr!r}, _ns)
-
-if _result is not None:
-    sys.stdout.write(repr(_result))
-"""
+    first = out.splitlines()
 
-    p = subprocess.run([PYTHON, "-c", code],
-                       stdout=subprocess.PIPE,
-                       stderr=subprocess.PIPE,
-                       timeout=5)
+    return first[0].strip() if first else ""
 
-    err = p.stderr.decode("utf-8", "ignore")
-
-    if err:
-        print("STDERR:")
-        print(err)
-
-    out = p.stdout.decode("utf-8", "ignore").splitlines()
-
-    return out[0].strip() if out else ""
-
-@pytest.mark.parametrize("commands,expected", [
+MULTILINE_CASES = [
     # if-elif-else
     (["a = 5",
       "if a == 5:",
@@ -10779,30 +10885,90 @@ if _result is not None:
       "a is not b"], "True"),
 
 
-])
+]
 
-def test_multiline_expressions(commands, expected):
+
+class TestCppython:
     """
-    Тестирует вычисление многострочных выражений кода,
-    интерпретируемых интерпретаторами cppython и CPython.
-    Тесты проверяют корректность присваивания переменных,
-    конструкций управления потоком, таких как if-elif-else, циклы,
-    и других выражений. Для каждого предоставленного входного случая
-    гарантируется, что cppython и CPython производят одинаковые
-    результаты, соответствующие ожидаемому выводу.
-
-    :param commands: Список строк, представляющих строки многострочного
-        кода Python. Эти команды выполняются последовательно.
-    :type commands: List[str]
-    :param expected: Ожидаемый вывод, полученный в результате выполнения кода,
-        представленного в `commands`.
-    :type expected: str
-    :return: None
-    :raises AssertionError: Если выводы cppython или CPython
-        не соответствуют ожидаемому результату `expected` или не соответствуют друг другу.
+    Группирует интеграционные тесты вокруг одного прогретого REPL cppython:
+    обе таблицы случаев — однострочная и многострочная — делят процесс,
+    запускаемый один раз на класс (с pytest-xdist — один раз на воркер),
+    без холодного старта на границе между группами. Отдельной изоляции
+    состояния между случаями нет: у cppython нет команды сброса окружения,
+    а случаи и так определяют все используемые ими имена.
     """
-    my = run_cppython(commands)
-    py = run_cpython(commands)
-    assert my == expected, f"cppython: {commands!r} -> {my!r}, expected: {expected!r}"
-    assert py == expected, f"CPython: {commands!r} -> {py!r}, expected: {expected!r}"
-    assert my == py,     f"Mismatch: cppython={my!r} vs CPython={py!r}"
\ No newline at end of file
+
+    @pytest.fixture(scope="class")
+    @classmethod
+    def repl(cls):
+        """
+        Классовая фикстура: долгоживущий процесс cppython, общий для всех
+        тестов класса.
+
+        :return: Объект Popen работающего REPL cppython.
+        """
+        proc = _start_repl([_resolve_binary()])
+        yield proc
+        _stop_repl(proc)
+
+    @pytest.mark.individual
+    @pytest.mark.parametrize("expr,expected", SINGLE_LINE_CASES)
+    def test_single_line_expressions(self, repl, expr, expected):
+        """
+        Поштучный прогон однострочных случаев. Тестовые случаи определяются
+        списком кортежей, где каждый кортеж состоит из `expr` (строки,
+        представляющей выражение для оценки) и `expected` (строки,
+        представляющей ожидаемый результат).
+
+        :param expr: Строка, представляющая выражение, которое должно быть вычислено.
+        :param expected: Строка, представляющая ожидаемый результат вычисления выражения.
+        :return: None
+        """
+        my = run_cppython(repl, expr)
+        assert my == expected, f"cppython: {expr!r} -> {my!r}, expected: {expected!r}"
+
+    def test_single_line_expressions_batched(self, repl):
+        """
+        Прогоняет все однострочные случаи одной пачкой через REPL cppython:
+        один обмен по stdin/stdout вместо обмена на каждый случай. Это штатный
+        путь CI; поштучный вариант выше остаётся за маркером individual для
+        отладки отдельных падений (pytest -m individual).
+
+        :param repl: Фикстура с долгоживущим REPL cppython.
+        :return: None
+        :raises AssertionError: Если хотя бы один случай дал вывод, не совпадающий
+            с ожидаемым результатом.
+        """
+        exprs = [expr for expr, _ in SINGLE_LINE_CASES]
+        results = run_cppython_batch(repl, exprs)
+
+        mismatches = [
+            f"cppython: {expr!r} -> {my!r}, expected: {expected!r}"
+            for (expr, expected), my in zip(SINGLE_LINE_CASES, results)
+            if my != expected
+        ]
+
+        assert not mismatches, "\n".join(mismatches)
+
+    @pytest.mark.parametrize("commands,expected", MULTILINE_CASES)
+    def test_multiline_expressions(self, repl, commands, expected):
+        """
+        Тестирует вычисление многострочных выражений кода,
+        интерпретируемых cppython. Тесты проверяют корректность присваивания
+        переменных, конструкций управления потоком, таких как if-elif-else,
+        циклы, и других выражений. Для каждого предоставленного входного случая
+        гарантируется, что cppython производит результат, соответствующий
+        ожидаемому выводу.
+
+        :param commands: Список строк, представляющих строки многострочного
+            кода Python. Эти команды выполняются последовательно.
+        :type commands: List[str]
+        :param expected: Ожидаемый вывод, полученный в результате выполнения кода,
+            представленного в `commands`.
+        :type expected: str
+        :return: None
+        :raises AssertionError: Если вывод cppython не соответствует ожидаемому
+            результату `expected`.
+        """
+        my = run_cppython(repl, commands)
+        assert my == expected, f"cppython: {commands!r} -> {my!r}, expected: {expected!r}"
\ No newline at end of file